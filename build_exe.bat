@@ -25,7 +25,6 @@ pyinstaller --onefile ^
     --name upscayv ^
     --console ^
     --add-data "README.md;." ^
-    --hidden-import multiprocessing ^
     --hidden-import concurrent.futures ^
     upscayv.py
 
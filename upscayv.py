@@ -1,15 +1,25 @@
 import os
+import re
 import subprocess
 import json
 import shutil
 import time
 import argparse
+import threading
+import queue
+import heapq
+import collections
+import itertools
+import tempfile
+import hashlib
+import stat
 from pathlib import Path
+from functools import lru_cache
 from tqdm import tqdm
-from concurrent.futures import ProcessPoolExecutor, as_completed
-import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 
 # --- [설정 영역] ---
+@lru_cache(maxsize=None)
 def find_upscayl_path():
     """Upscayl 실행 파일 경로를 자동으로 찾습니다."""
     # 1. PATH 환경 변수에서 찾기
@@ -38,36 +48,97 @@ def find_upscayl_path():
     # 3. 찾지 못한 경우 None 반환
     return None
 
-UPSCAYL_PATH = find_upscayl_path()
-if UPSCAYL_PATH is None:
-    print("⚠️ Upscayl 실행 파일을 찾을 수 없습니다.")
-    print("다음 경로 중 하나에 설치되어 있는지 확인해주세요:")
-    print("  - %LOCALAPPDATA%\\Programs\\upscayl\\upscayl-bin.exe")
-    print("  - %PROGRAMFILES%\\upscayl\\upscayl-bin.exe")
-    print("  - 또는 PATH 환경 변수에 등록되어 있는지 확인하세요.")
-    exit(1)
-
-# Upscayl 실행 파일이 있는 디렉토리에서 models 폴더 찾기
-upscayl_dir = Path(UPSCAYL_PATH).parent
-possible_model_paths = [
-    upscayl_dir / "models",
-    upscayl_dir / "resources" / "models",
-    upscayl_dir.parent / "models",
-    upscayl_dir.parent / "resources" / "models",
-]
+@lru_cache(maxsize=None)
+def find_model_path(upscayl_path):
+    """Upscayl 실행 파일이 있는 디렉토리에서 models 폴더를 찾습니다."""
+    upscayl_dir = Path(upscayl_path).parent
+    possible_model_paths = [
+        upscayl_dir / "models",
+        upscayl_dir / "resources" / "models",
+        upscayl_dir.parent / "models",
+        upscayl_dir.parent / "resources" / "models",
+    ]
+    
+    for model_path in possible_model_paths:
+        if model_path.exists() and model_path.is_dir():
+            return str(model_path)
+    return None
 
+# 시작 시 감지되는 경로 (메인 프로세스에서 설정)
+UPSCAYL_PATH = None
 MODEL_PATH = None
-for model_path in possible_model_paths:
-    if model_path.exists() and model_path.is_dir():
-        MODEL_PATH = str(model_path)
-        break
+AVAILABLE_MODELS = None
+# 저장된 (GPU 개수, GPU별 메모리 MB) - nvidia-smi가 바뀌지 않았을 때만 사용
+GPU_INFO = None
+
+# 환경 감지 결과 캐시 (FFmpeg/인코더 테스트는 실행할 때마다 수 초가 걸림)
+# Windows는 %LOCALAPPDATA%\upscayv, 그 외는 ~/.cache/upscayv에 저장
+if os.name == 'nt' and os.environ.get("LOCALAPPDATA"):
+    ENV_CACHE_PATH = Path(os.environ["LOCALAPPDATA"]) / "upscayv" / "env.json"
+else:
+    ENV_CACHE_PATH = Path.home() / ".cache" / "upscayv" / "env.json"
+ENV_CACHE_TTL = 24 * 60 * 60  # 24시간
+# GPU 인코더 테스트가 실패해 CPU 인코더로 대체한 경우 (GPU 사용 중 등 일시적인 원인일 수 있음)
+ENV_CACHE_FALLBACK_TTL = 10 * 60  # 10분
+
+def nvidia_smi_key():
+    """GPU 정보 캐시의 키로 쓰는 nvidia-smi 경로와 수정 시각 (없으면 None)"""
+    nvidia_smi = shutil.which('nvidia-smi')
+    if not nvidia_smi:
+        return None
+    try:
+        return [nvidia_smi, os.path.getmtime(nvidia_smi)]
+    except OSError:
+        return None
 
-if MODEL_PATH is None:
-    # 기본값으로 상대 경로 사용 (사용자가 직접 설정 가능)
-    MODEL_PATH = "models"
-    print(f"⚠️ 모델 폴더를 자동으로 찾지 못했습니다. 기본값 '{MODEL_PATH}'을 사용합니다.")
-    print(f"   필요시 스크립트에서 MODEL_PATH를 직접 설정해주세요.")
+def load_env_cache(ffmpeg_path):
+    """저장된 환경 감지 결과를 불러옵니다. 만료되었거나 환경이 바뀌었으면 None을 반환합니다."""
+    if not ffmpeg_path:
+        return None
+    try:
+        with open(ENV_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        
+        # FFmpeg 경로/수정 시각, OS, Upscayl 경로, 모델 폴더 수정 시각이 모두 같아야 유효
+        valid = (
+            time.time() - cache['created'] < cache.get('ttl', ENV_CACHE_TTL)
+            and cache['os_name'] == os.name
+            and cache['ffmpeg_path'] == ffmpeg_path
+            and cache['ffmpeg_mtime'] == os.path.getmtime(ffmpeg_path)
+            and os.path.exists(cache['upscayl_path'])
+            and cache['model_mtime'] == os.path.getmtime(cache['model_path'])
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return cache if valid else None
 
+def save_env_cache(ffmpeg_path, upscayl_path, model_path, models, video_encoder, cuda_scale, gpu_info, ttl=ENV_CACHE_TTL):
+    """환경 감지 결과를 다음 실행에서 재사용할 수 있도록 저장합니다."""
+    try:
+        cache = {
+            'created': time.time(),
+            'ttl': ttl,
+            'os_name': os.name,
+            'ffmpeg_path': ffmpeg_path,
+            'ffmpeg_mtime': os.path.getmtime(ffmpeg_path),
+            'upscayl_path': upscayl_path,
+            'model_path': model_path,
+            'model_mtime': os.path.getmtime(model_path),
+            'models': models,
+            'video_encoder': video_encoder,
+            'cuda_scale': cuda_scale,
+            # GPU 정보는 드라이버(nvidia-smi)가 그대로일 때만 재사용
+            'nvidia_smi': nvidia_smi_key(),
+            'gpu_count': gpu_info[0],
+            'vram_mb': list(gpu_info[1])
+        }
+        os.makedirs(ENV_CACHE_PATH.parent, exist_ok=True)
+        with open(ENV_CACHE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        debug_print(f"  [디버그] 환경 감지 결과를 저장하지 못했습니다: {e}")
+
+@lru_cache(maxsize=None)
 def find_available_models(model_path):
     """모델 폴더에서 사용 가능한 모델 목록을 찾습니다."""
     if not os.path.exists(model_path):
@@ -75,40 +146,39 @@ def find_available_models(model_path):
     
     models = []
     # 모델 폴더의 파일/폴더 목록 확인
-    for item in os.listdir(model_path):
-        item_path = os.path.join(model_path, item)
-        # .bin 파일이나 폴더를 모델로 간주
-        if os.path.isfile(item_path) and item.endswith('.bin'):
-            models.append(item.replace('.bin', ''))
-        elif os.path.isdir(item_path):
-            # 폴더 내에 .bin 파일이 있는지 확인
-            bin_files = [f for f in os.listdir(item_path) if f.endswith('.bin')]
-            if bin_files:
-                models.append(item)
+    # (scandir의 DirEntry는 디렉토리를 읽을 때 얻은 정보로 파일/폴더 여부를 판단하므로 stat 호출이 줄어듦)
+    with os.scandir(model_path) as entries:
+        for entry in entries:
+            # .bin 파일이나 폴더를 모델로 간주
+            if entry.is_file() and entry.name.endswith('.bin'):
+                models.append(entry.name[:-len('.bin')])
+            elif entry.is_dir():
+                # 폴더 내에 .bin 파일이 있는지 확인 (하나라도 찾으면 중단)
+                with os.scandir(entry.path) as sub_entries:
+                    if any(sub.name.endswith('.bin') for sub in sub_entries):
+                        models.append(entry.name)
     
     return sorted(models)
 
+# 모델 이름 키워드별 속도 점수 보정 (각 그룹에서 처음 일치하는 키워드 하나만 적용)
+SPEED_SCORE_RULES = (
+    # 빠른 모델 키워드 (점수 감소)
+    (('x2', -50), ('x4', -30)),
+    (('small', -20), ('fast', -20), ('lite', -20)),
+    # 느린 모델 키워드 (점수 증가)
+    (('x8', 30),),
+    (('large', 20), ('ultra', 20), ('balanced', 20)),
+    (('remacri', 15), ('ultramix', 15)),
+)
+
+@lru_cache(maxsize=None)
 def get_model_speed_score(model_name):
     """모델 이름을 기반으로 속도 점수를 계산합니다. 점수가 낮을수록 빠름."""
-    score = 100
     model_lower = model_name.lower()
-    
-    # 빠른 모델 키워드 (점수 감소)
-    if 'x2' in model_lower:
-        score -= 50
-    elif 'x4' in model_lower:
-        score -= 30
-    
-    if 'small' in model_lower or 'fast' in model_lower or 'lite' in model_lower:
-        score -= 20
-    
-    # 느린 모델 키워드 (점수 증가)
-    if 'x8' in model_lower:
-        score += 30
-    if 'large' in model_lower or 'ultra' in model_lower or 'balanced' in model_lower:
-        score += 20
-    if 'remacri' in model_lower or 'ultramix' in model_lower:
-        score += 15
+    score = 100 + sum(
+        next((delta for keyword, delta in group if keyword in model_lower), 0)
+        for group in SPEED_SCORE_RULES
+    )
     
     # 모델 이름 길이 (짧을수록 간단한 모델일 가능성)
     if len(model_name) < 10:
@@ -121,11 +191,72 @@ def get_fastest_model(models):
     if not models:
         return None
     
-    # 속도 점수로 정렬 (점수가 낮을수록 빠름)
-    sorted_models = sorted(models, key=get_model_speed_score)
-    return sorted_models[0]
+    # 속도 점수가 가장 낮은 모델 (점수가 낮을수록 빠름, 같으면 목록 순서상 먼저인 모델)
+    return min(models, key=get_model_speed_score)
+
+# 인코더별 추가 파라미터 (인코더 테스트와 최종 합성에서 함께 사용)
+ENCODER_PARAMS = {
+    # NVENC 최고속 프리셋 + 품질 기준 가변 비트레이트
+    'h264_nvenc': ['-preset', 'p1', '-tune', 'hq', '-rc', 'vbr', '-cq', '23', '-b:v', '0'],
+    # AMF 속도 우선 + 트랜스코딩 용도 + 고정 QP
+    'h264_amf': ['-quality', 'speed', '-usage', 'transcoding', '-rc', 'cqp', '-qp_i', '23', '-qp_p', '23'],
+}
+
+def build_scale_args(encoder_name, width, height, cuda_scale=False):
+    """인코더에 맞는 스케일 필터와 픽셀 포맷 인자를 반환합니다."""
+    if encoder_name == 'h264_nvenc' and cuda_scale:
+        # 프레임을 GPU로 올린 뒤 스케일링과 yuv420p 변환을 모두 GPU에서 처리
+        return ['-vf', f'format=bgr0,hwupload_cuda,scale_cuda={width}:{height}:format=yuv420p']
+    # AMF는 인코딩 속도를 우선하여 가벼운 스케일러 사용, CPU 인코딩은 Lanczos 유지
+    flags = 'fast_bilinear' if encoder_name == 'h264_amf' else 'lanczos'
+    return ['-vf', f'scale={width}:{height}:flags={flags}', '-pix_fmt', 'yuv420p']
 
-def test_encoder(encoder_name, error_keywords, debug=False):
+def test_cuda_scaling(debug=False):
+    """NVENC 인코딩 전에 GPU 스케일링(hwupload_cuda + scale_cuda)을 사용할 수 있는지 테스트합니다."""
+    test_cmd = [
+        'ffmpeg', '-hide_banner', '-f', 'lavfi', '-i', 'testsrc=duration=0.1:size=320x240:rate=1',
+        *build_scale_args('h264_nvenc', 160, 120, cuda_scale=True),
+        '-c:v', 'h264_nvenc', *ENCODER_PARAMS['h264_nvenc'],
+        '-frames:v', '1', '-f', 'null', '-'
+    ]
+    try:
+        test_result = subprocess.run(test_cmd, capture_output=True, timeout=10)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        if debug:
+            debug_print(f"  [디버그] GPU 스케일링 테스트 실패: {e}")
+        return False
+    
+    if debug and test_result.returncode != 0:
+        debug_print(f"  [디버그] GPU 스케일링 테스트 실패 (returncode: {test_result.returncode}):")
+        debug_print(f"    {test_result.stderr[-500:].decode('utf-8', errors='ignore')}")
+    return test_result.returncode == 0
+
+# 인코더 테스트 성공 후에도 stderr에 남으면 사용 불가로 판단할 에러 문구
+# (stderr를 문자열로 디코딩하지 않고 바이트 그대로 검사)
+NVENC_ERROR_RE = re.compile(b'|'.join(re.escape(keyword.encode()) for keyword in [
+    'No NVENC capable devices found',
+    'No capable devices found',
+    'NVENC not available',
+    'Cannot load',
+    'No such filter',
+    'not found',
+    'unable to find'
+]), re.I)
+AMF_ERROR_RE = re.compile(b'|'.join(re.escape(keyword.encode()) for keyword in [
+    'No capable devices found',
+    'AMF not available',
+    'Cannot load',
+    'No such filter',
+    'Failed to initialize',
+    'AMF runtime'
+]), re.I)
+# `ffmpeg -encoders` 목록에서 비디오 인코더 이름을 뽑아내기 위한 패턴 (예: " V....D h264_nvenc ...")
+VIDEO_ENCODER_LINE_RE = re.compile(rb'^\s*V\S*\s+(\S+)', re.M)
+# 디버그 출력 시 stderr에서 에러로 보이는 줄만 골라내기 위한 패턴
+# (단어 단위로 비교하여 'node', 'noise' 같은 단어 속 'no'는 제외)
+ERROR_LINE_RE = re.compile(rb'\b(?:errors?|failed|cannot|not found|unable|no|missing)\b', re.I)
+
+def test_encoder(encoder_name, error_re, debug=False):
     """인코더가 실제로 사용 가능한지 테스트합니다."""
     try:
         # AMD AMF의 경우 더 큰 해상도와 적절한 파라미터 필요
@@ -133,14 +264,14 @@ def test_encoder(encoder_name, error_keywords, debug=False):
             # AMF는 최소 해상도 요구사항이 있을 수 있으므로 더 큰 해상도로 테스트
             test_cmd = [
                 'ffmpeg', '-hide_banner', '-f', 'lavfi', '-i', 'testsrc=duration=0.1:size=320x240:rate=1',
-                '-c:v', 'h264_amf', '-quality', 'speed', '-rc', 'cqp', '-qp_i', '23', '-qp_p', '23',
+                '-c:v', 'h264_amf', *ENCODER_PARAMS['h264_amf'],
                 '-frames:v', '1', '-f', 'null', '-'
             ]
         elif encoder_name == 'h264_nvenc':
             # NVIDIA NVENC는 적절한 파라미터와 함께 테스트
             test_cmd = [
                 'ffmpeg', '-hide_banner', '-f', 'lavfi', '-i', 'testsrc=duration=0.1:size=320x240:rate=1',
-                '-c:v', 'h264_nvenc', '-preset', 'fast', '-rc', 'cbr', '-b:v', '1M',
+                '-c:v', 'h264_nvenc', *ENCODER_PARAMS['h264_nvenc'],
                 '-frames:v', '1', '-f', 'null', '-'
             ]
         else:
@@ -153,7 +284,6 @@ def test_encoder(encoder_name, error_keywords, debug=False):
         test_result = subprocess.run(
             test_cmd,
             capture_output=True,
-            text=True,
             timeout=10
         )
         # 디버깅 모드일 때 전체 에러 메시지 출력
@@ -161,22 +291,22 @@ def test_encoder(encoder_name, error_keywords, debug=False):
             if test_result.returncode != 0:
                 debug_print(f"  [디버그] {encoder_name} 테스트 실패 (returncode: {test_result.returncode}):")
                 # stderr에서 실제 에러 부분만 추출 (Input 정보 제외)
-                error_lines = [line for line in test_result.stderr.split('\n') 
-                             if any(keyword in line.lower() for keyword in ['error', 'failed', 'cannot', 'not found', 'unable', 'no', 'missing'])]
+                # 최대 8줄을 찾으면 나머지 줄은 검사하지 않음
+                error_lines = list(itertools.islice(
+                    (line for line in test_result.stderr.splitlines() if ERROR_LINE_RE.search(line)), 8
+                ))
                 if error_lines:
-                    for line in error_lines[:8]:  # 최대 8줄까지
-                        debug_print(f"    {line.strip()}")
+                    for line in error_lines:
+                        debug_print(f"    {line.strip().decode('utf-8', errors='ignore')}")
                 else:
                     # 에러 라인이 없으면 마지막 부분 출력
-                    debug_print(f"    {test_result.stderr[-500:]}")
+                    debug_print(f"    {test_result.stderr[-500:].decode('utf-8', errors='ignore')}")
             else:
                 debug_print(f"  [디버그] {encoder_name} 테스트 성공!")
         
         # 성공했고 (returncode == 0), 에러 메시지에 관련 에러가 없어야 사용 가능
         if test_result.returncode == 0:
-            # stderr를 소문자로 변환하여 에러 키워드 확인
-            stderr_lower = test_result.stderr.lower()
-            if not any(err.lower() in stderr_lower for err in error_keywords):
+            if not error_re.search(test_result.stderr):
                 return True
             elif debug:
                 debug_print(f"  [디버그] {encoder_name} 테스트는 성공했지만 에러 키워드가 감지되었습니다.")
@@ -192,36 +322,46 @@ def test_encoder(encoder_name, error_keywords, debug=False):
             debug_print(f"  [디버그] {encoder_name} 테스트 예외: {e}")
     return False
 
+@lru_cache(maxsize=None)
 def detect_video_encoder():
-    """GPU 하드웨어 인코더를 우선적으로 감지합니다. NVIDIA > AMD > CPU 순서."""
+    """GPU 하드웨어 인코더를 감지하고 (인코더 이름, GPU 인코더 대신 CPU 인코더로 대체했는지)를 반환합니다."""
     try:
         # FFmpeg에서 사용 가능한 인코더 목록 확인
         result = subprocess.run(
             ['ffmpeg', '-hide_banner', '-encoders'],
             capture_output=True,
-            text=True,
             timeout=5
         )
         
         if result.returncode != 0:
             print("  [경고] FFmpeg 인코더 목록을 가져올 수 없습니다. CPU 인코딩을 사용합니다.")
-            return "libx264"
+            return "libx264", True
         
-        # 1. NVIDIA GPU (h264_nvenc) 확인
-        if 'h264_nvenc' in result.stdout:
+        # FFmpeg 빌드에 포함된 GPU 인코더만 테스트 대상으로 선택
+        # (AMD iGPU도 지원하므로 AMF도 함께 테스트)
+        # 설명 문구까지 포함한 부분 문자열 검색 대신 인코더 이름만 집합으로 비교
+        available_encoders = {name.decode() for name in VIDEO_ENCODER_LINE_RE.findall(result.stdout)}
+        probes = {}
+        if 'h264_nvenc' in available_encoders:
             print("  [검색] NVIDIA NVENC 인코더를 감지했습니다. 테스트 중...")
-            nvenc_errors = [
-                'No NVENC capable devices found',
-                'No capable devices found',
-                'NVENC not available',
-                'Cannot load',
-                'No such filter',
-                'not found',
-                'unable to find'
-            ]
-            if test_encoder('h264_nvenc', nvenc_errors, debug=DEBUG_MODE):
+            probes['h264_nvenc'] = NVENC_ERROR_RE
+        if 'h264_amf' in available_encoders:
+            print("  [검색] AMD AMF 인코더를 감지했습니다. 테스트 중...")
+            probes['h264_amf'] = AMF_ERROR_RE
+        
+        # 인코더 테스트는 각각 FFmpeg 프로세스를 띄우므로 동시에 실행하여 감지 시간 단축
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = {
+                name: executor.submit(test_encoder, name, error_re, debug=DEBUG_MODE)
+                for name, error_re in probes.items()
+            }
+        passed = {name: future.result() for name, future in futures.items()}
+        
+        # 1. NVIDIA GPU (h264_nvenc) 확인
+        if 'h264_nvenc' in probes:
+            if passed['h264_nvenc']:
                 print("  [성공] NVIDIA GPU 인코더(h264_nvenc)를 사용할 수 있습니다!")
-                return "h264_nvenc"
+                return "h264_nvenc", False
             else:
                 # NVIDIA 인코더가 있지만 테스트 실패 - 디버깅 정보 출력
                 print("  [경고] NVIDIA GPU 인코더(h264_nvenc)가 감지되었지만 초기화에 실패했습니다.")
@@ -237,20 +377,10 @@ def detect_video_encoder():
             print("    - 또는 'ffmpeg -encoders | findstr nvenc' 명령으로 확인")
         
         # 2. AMD GPU (h264_amf) 확인
-        if 'h264_amf' in result.stdout:
-            print("  [검색] AMD AMF 인코더를 감지했습니다. 테스트 중...")
-            amf_errors = [
-                'No capable devices found',
-                'AMF not available',
-                'Cannot load',
-                'No such filter',
-                'Failed to initialize',
-                'AMF runtime'
-            ]
-            # AMD iGPU도 지원하므로 테스트 (디버깅 모드 활성화)
-            if test_encoder('h264_amf', amf_errors, debug=DEBUG_MODE):
+        if 'h264_amf' in probes:
+            if passed['h264_amf']:
                 print("  [성공] AMD GPU 인코더(h264_amf)를 사용할 수 있습니다!")
-                return "h264_amf"
+                return "h264_amf", False
             else:
                 # AMD 인코더가 있지만 테스트 실패 - 디버깅 정보 출력
                 print("  [정보] AMD GPU 인코더(h264_amf)가 감지되었지만 초기화에 실패했습니다.")
@@ -259,10 +389,12 @@ def detect_video_encoder():
     except (subprocess.TimeoutExpired, FileNotFoundError, Exception) as e:
         print(f"  [경고] 인코더 감지 중 오류 발생: {e}")
         print("  [대안] CPU 인코딩을 사용합니다.")
+        probes = None
     
     # 3. GPU 인코더를 사용할 수 없으면 CPU 인코더 사용
     print("  [정보] CPU 인코더(libx264)를 사용합니다.")
-    return "libx264"
+    # GPU 인코더가 있는데 테스트에 실패했거나 감지 중 오류가 났으면 대체 선택으로 표시
+    return "libx264", probes is None or bool(probes)
 
 # 전역 디버그 모드 플래그
 DEBUG_MODE = False
@@ -272,13 +404,24 @@ def debug_print(*args, **kwargs):
     if DEBUG_MODE:
         print(*args, **kwargs)
 
+def ffmpeg_log_args():
+    """추출/인코딩 FFmpeg의 로그 인자를 반환합니다.
+    
+    디버그 모드에서는 -benchmark로 단계별 소요 시간(utime/rtime)과 최대 메모리를 출력합니다.
+    """
+    if DEBUG_MODE:
+        return ['-loglevel', 'info', '-nostats', '-benchmark']
+    return ['-loglevel', 'error']
+
+@lru_cache(maxsize=None)
 def check_ffmpeg():
     """FFmpeg이 설치되어 있고 사용 가능한지 확인합니다."""
     try:
+        # 실행 여부만 확인하므로 출력은 읽지 않음
         result = subprocess.run(
             ['ffmpeg', '-version'],
-            capture_output=True,
-            text=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
             timeout=5
         )
         if result.returncode == 0:
@@ -288,14 +431,13 @@ def check_ffmpeg():
     except (FileNotFoundError, subprocess.TimeoutExpired, Exception):
         return False, None
 
+@lru_cache(maxsize=None)
 def get_cpu_info():
     """CPU 정보를 가져옵니다."""
-    try:
-        cpu_count = multiprocessing.cpu_count()
-        return cpu_count
-    except Exception:
-        return 4  # 기본값
+    # 코어 수를 알 수 없으면 None이 반환되므로 기본값 사용
+    return os.cpu_count() or 4
 
+@lru_cache(maxsize=None)
 def get_gpu_info():
     """NVIDIA GPU 정보를 가져옵니다."""
     try:
@@ -303,11 +445,10 @@ def get_gpu_info():
         result = subprocess.run(
             ['nvidia-smi', '--list-gpus'],
             capture_output=True,
-            text=True,
             timeout=5
         )
         if result.returncode == 0:
-            gpu_count = len(result.stdout.strip().split('\n'))
+            gpu_count = len(result.stdout.strip().split(b'\n'))
             return gpu_count
     except (FileNotFoundError, subprocess.TimeoutExpired, Exception):
         pass
@@ -323,70 +464,407 @@ def get_gpu_info():
     
     return 0
 
-def calculate_optimal_workers(cpu_count, gpu_count, has_gpu_encoder):
+@lru_cache(maxsize=None)
+def get_gpu_vram():
+    """NVIDIA GPU별 메모리(MB) 목록을 가져옵니다. 확인할 수 없으면 빈 튜플."""
+    try:
+        result = subprocess.run(
+            ['nvidia-smi', '--query-gpu=memory.total', '--format=csv,noheader,nounits'],
+            capture_output=True,
+            timeout=5
+        )
+        if result.returncode == 0:
+            return tuple(int(line) for line in result.stdout.split() if line.isdigit())
+    except (FileNotFoundError, subprocess.TimeoutExpired, Exception):
+        pass
+    return ()
+
+def calculate_optimal_workers(cpu_count, gpu_count, has_gpu_encoder, vram_mb=()):
     """CPU와 GPU 정보를 기반으로 최적의 워커 수를 계산합니다."""
     if gpu_count > 0:
-        # GPU가 있는 경우: GPU 개수에 맞춰 워커 수 설정
-        # Upscayl이 GPU를 사용하므로, GPU 개수만큼 병렬 처리 가능
-        # 하지만 CPU도 일부 사용하므로 약간의 여유를 둠
-        if gpu_count == 1:
-            # 단일 GPU: CPU 코어 수의 50-75% 정도 사용
-            recommended = max(1, min(cpu_count // 2, 4))
-        else:
-            # 다중 GPU: GPU 개수에 맞춰 설정하되, CPU 코어 수를 초과하지 않음
-            recommended = min(gpu_count, cpu_count)
-        
-        # GPU가 있으면 최소 2개는 사용
-        recommended = max(2, recommended)
+        # GPU가 있는 경우: Upscayl 처리 속도는 CPU가 아니라 GPU 메모리에 달려 있음
+        # 한 GPU에 Upscayl을 너무 많이 띄우면 VRAM이 부족해져 오히려 느려지므로
+        # GPU당 1개, 모든 GPU의 메모리가 8GB 이상이면 GPU당 2개
+        per_gpu = 2 if vram_mb and min(vram_mb) >= 8192 else 1
+        recommended = gpu_count * per_gpu
     else:
         # GPU가 없는 경우: CPU 기반 처리
         # CPU 코어 수의 75% 정도 사용 (시스템 응답성 유지)
         recommended = max(1, int(cpu_count * 0.75))
+        recommended = min(recommended, cpu_count)
     
     # 최대값 제한 (너무 많은 워커는 오히려 성능 저하)
-    recommended = min(recommended, cpu_count, 8)
+    recommended = min(recommended, 8)
     
     return recommended
 
-def upscale_single_frame(args):
-    """단일 프레임을 업스케일링하는 함수 (병렬 처리용)."""
-    frame_file, input_dir_abs, output_dir_abs, upscayl_path, model_path_abs, selected_model, scale_factor, ffmpeg_path = args
+def add_ffmpeg_to_path(ffmpeg_path):
+    """FFmpeg 폴더를 현재 프로세스의 PATH에 한 번만 추가합니다 (자식 프로세스는 그대로 상속)."""
+    if ffmpeg_path:
+        ffmpeg_dir = os.path.dirname(ffmpeg_path)
+        current_path = os.environ.get('PATH', '')
+        if ffmpeg_dir not in current_path.split(os.pathsep):
+            os.environ['PATH'] = f"{ffmpeg_dir}{os.pathsep}{current_path}"
+
+def read_bmp_frames(stream):
+    """FFmpeg image2pipe로 전달되는 BMP 스트림을 프레임 단위 bytes로 나눕니다.
     
-    input_path = os.path.join(input_dir_abs, frame_file)
-    output_path = os.path.join(output_dir_abs, frame_file)
+    BMP 헤더의 2~5번째 바이트에 파일 전체 크기가 들어 있으므로 디코딩 없이 프레임 경계를 알 수 있습니다.
+    """
+    while True:
+        header = stream.read(6)
+        if not header:
+            return
+        if len(header) < 6 or header[:2] != b'BM':
+            raise ValueError("FFmpeg 출력에서 올바른 BMP 헤더를 찾을 수 없습니다.")
+        size = int.from_bytes(header[2:6], 'little')
+        body = stream.read(size - 6)
+        if len(body) < size - 6:
+            raise ValueError("FFmpeg 출력이 프레임 중간에 끝났습니다.")
+        yield header + body
+
+def write_frame_file(path, frame_data):
+    """프레임 한 장을 파일로 기록합니다."""
+    with open(path, 'wb') as f:
+        f.write(frame_data)
+
+def detect_decode_hwaccel(video_path, encoder_name):
+    """프레임 추출에 쓸 하드웨어 디코딩 인자를 반환합니다.
     
-    # Upscayl 명령어
-    upscale_cmd = f'"{upscayl_path}" -i "{input_path}" -o "{output_path}" -s {scale_factor} -m "{model_path_abs}" -n {selected_model}'
+    GPU 인코더가 감지된 경우 같은 GPU의 디코더를 사용하도록 시도하고,
+    영상의 첫 프레임 디코딩 테스트가 실패하면 빈 리스트(CPU 디코딩)를 반환합니다.
+    """
+    if encoder_name == 'h264_nvenc':
+        hwaccel_args = ['-hwaccel', 'cuda']
+    elif encoder_name == 'h264_amf' and os.name == 'nt':
+        hwaccel_args = ['-hwaccel', 'd3d11va']
+    else:
+        return []
     
-    # 환경 변수 설정
-    env = os.environ.copy()
-    if ffmpeg_path:
-        ffmpeg_dir = os.path.dirname(ffmpeg_path)
-        current_path = env.get('PATH', '')
-        if ffmpeg_dir not in current_path:
-            env['PATH'] = f"{ffmpeg_dir};{current_path}"
-    
-    # Upscayl 실행
-    result = subprocess.run(
-        upscale_cmd,
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        env=env,
-        cwd=os.getcwd()
+    probe_cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', *hwaccel_args,
+        '-i', video_path, '-frames:v', '1', '-f', 'null', '-'
+    ]
+    try:
+        probe_result = subprocess.run(probe_cmd, capture_output=True, timeout=10)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        debug_print(f"  [디버그] 하드웨어 디코딩 테스트 실패: {e}")
+        return []
+    
+    if probe_result.returncode != 0:
+        debug_print(f"  [디버그] 하드웨어 디코딩 테스트 실패 (returncode: {probe_result.returncode}):")
+        debug_print(f"    {probe_result.stderr[-500:].decode('utf-8', errors='ignore')}")
+        return []
+    return hwaccel_args
+
+def extract_frames(video_path, input_dir_abs, chunk_size, done_frames=frozenset(), hwaccel_args=()):
+    """FFmpeg에서 BMP 프레임을 파이프로 받아 묶음 폴더에 기록하고, 묶음이 채워질 때마다 (묶음 폴더, 프레임 파일 목록)을 넘겨줍니다."""
+    # PNG 압축 없이 픽셀을 그대로 받아 추출 단계의 CPU 사용량을 줄임
+    # 알파 채널이 있는 영상도 24비트(bgr24)로 고정해 프레임 크기를 일정하게 유지
+    # hwaccel_args가 있으면 GPU에서 디코딩한 프레임을 내려받아 BMP로 기록
+    extract_cmd = [
+        'ffmpeg', '-hide_banner', *ffmpeg_log_args(), '-threads', '0', *hwaccel_args,
+        '-i', video_path, '-f', 'image2pipe', '-c:v', 'bmp', '-pix_fmt', 'bgr24', '-'
+    ]
+    process = subprocess.Popen(extract_cmd, stdout=subprocess.PIPE, bufsize=1 << 20)
+    
+    # 파일 쓰기는 별도 스레드에서 처리해 디스크를 기다리는 동안에도 디코딩이 계속됨
+    # 쓰기 대기 중인 프레임 수를 제한해 메모리 사용량을 묶어 둠
+    write_slots = threading.BoundedSemaphore(EXTRACT_WRITE_AHEAD)
+    writer = ThreadPoolExecutor(max_workers=EXTRACT_WRITERS)
+    chunk_dir, chunk_frames, chunk_writes = None, [], []
+    try:
+        for index, frame_data in enumerate(read_bmp_frames(process.stdout)):
+            # chunk_size개마다 이전 묶음을 넘기고 새 묶음 폴더 생성 (추출이 끝나기 전에 업스케일링 시작)
+            if index % chunk_size == 0:
+                if chunk_frames:
+                    # 묶음의 모든 프레임이 디스크에 기록된 뒤에 넘김
+                    for future in chunk_writes:
+                        future.result()
+                    yield chunk_dir, chunk_frames
+                chunk_dir = os.path.join(input_dir_abs, f"chunk_{index // chunk_size:05d}")
+                os.makedirs(chunk_dir, exist_ok=True)
+                chunk_frames, chunk_writes = [], []
+            frame_file = f"frame_{index + 1:05d}.bmp"
+            chunk_frames.append(frame_file)
+            # 업스케일 결과가 이미 있는 프레임(이어하기)은 파일로 쓰지 않고 목록에만 넣음
+            if upscaled_frame_name(frame_file) in done_frames:
+                continue
+            write_slots.acquire()
+            future = writer.submit(write_frame_file, os.path.join(chunk_dir, frame_file), frame_data)
+            future.add_done_callback(lambda _: write_slots.release())
+            chunk_writes.append(future)
+        
+        # 마지막 묶음 (chunk_size보다 적을 수 있음)
+        if chunk_frames:
+            for future in chunk_writes:
+                future.result()
+            yield chunk_dir, chunk_frames
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        writer.shutdown(wait=True)
+        process.stdout.close()
+        returncode = process.wait()
+    
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, extract_cmd)
+
+def upscaled_frame_name(frame_file):
+    """추출된 프레임 파일명에 대응하는 업스케일 결과 파일명을 반환합니다."""
+    return os.path.splitext(frame_file)[0] + '.png'
+
+def build_upscale_cmd(upscayl_path, model_path_abs, selected_model, scale_factor):
+    """묶음마다 공통으로 쓰는 Upscayl 인자 리스트를 만듭니다 (-i/-o는 묶음별로 추가)."""
+    return [
+        upscayl_path,
+        '-s', str(scale_factor),
+        '-m', model_path_abs,
+        '-n', selected_model,
+        '-f', 'png'
+    ]
+
+# 실행 중인 Upscayl 프로세스 (중단 시 한꺼번에 종료)
+ACTIVE_PROCESSES = set()
+ACTIVE_PROCESSES_LOCK = threading.Lock()
+STOP_PROCESSES = threading.Event()
+
+def new_process_group_kwargs():
+    """Ctrl+C가 자식 프로세스에 직접 전달되지 않도록 별도 프로세스 그룹으로 실행하는 인자"""
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+def terminate_active_processes():
+    """실행 중인 Upscayl 프로세스를 모두 종료하고, 이후 시작되는 프로세스도 바로 종료되게 합니다."""
+    with ACTIVE_PROCESSES_LOCK:
+        STOP_PROCESSES.set()
+        processes = list(ACTIVE_PROCESSES)
+    for process in processes:
+        try:
+            process.terminate()
+        except OSError:
+            pass
+
+def run_tail(argv, env=None, tail=512, stdout=subprocess.DEVNULL):
+    """프로세스를 실행하고 stderr의 마지막 tail 바이트만 남겨 (종료 코드, stderr)를 반환합니다."""
+    # stdout은 기본적으로 버리며, None을 넘기면 콘솔에 그대로 출력됨
+    # 별도 프로세스 그룹으로 실행하고 중단 시 terminate_active_processes()로 종료
+    process = subprocess.Popen(
+        argv, stdout=stdout, stderr=subprocess.PIPE, env=env, **new_process_group_kwargs()
     )
+    with ACTIVE_PROCESSES_LOCK:
+        ACTIVE_PROCESSES.add(process)
+        if STOP_PROCESSES.is_set():
+            process.terminate()
+    # Upscayl은 진행률을 stderr로 계속 출력하므로 읽는 즉시 버려 파이프가 가득 차 멈추지 않게 하고
+    # 에러 확인에 필요한 끝부분만 유지
+    buf = collections.deque(maxlen=tail)
+    try:
+        for chunk in iter(lambda: process.stderr.read(4096), b''):
+            buf.extend(chunk)
+    finally:
+        process.stderr.close()
+        process.wait()
+        with ACTIVE_PROCESSES_LOCK:
+            ACTIVE_PROCESSES.discard(process)
+    return process.returncode, bytes(buf)
+
+def upscale_chunk(chunk_dir, output_dir_abs, base_cmd):
+    """프레임 묶음 폴더 하나를 Upscayl 한 번 실행으로 업스케일링합니다 (병렬 처리용)."""
+    # 이어하기로 묶음의 모든 프레임이 이미 업스케일되어 있으면 Upscayl을 실행하지 않음
+    with os.scandir(chunk_dir) as entries:
+        is_empty = next(entries, None) is None
+    if is_empty:
+        os.rmdir(chunk_dir)
+        return {'returncode': 0, 'stderr': b''}
     
-    # 결과 반환
-    return {
-        'frame_file': frame_file,
-        'returncode': result.returncode,
-        'stdout': result.stdout.decode('utf-8', errors='ignore') if result.stdout else '',
-        'stderr': result.stderr.decode('utf-8', errors='ignore') if result.stderr else '',
-        'output_path': output_path
-    }
+    # 공통 인자 리스트에 입력/출력 폴더만 붙여 shell 없이 바로 실행
+    # (-i/-o가 폴더면 모델 로드와 Vulkan 초기화를 한 번만 하고 폴더 안의 모든 이미지를 처리)
+    upscale_cmd = base_cmd + ['-i', chunk_dir, '-o', output_dir_abs]
+    
+    # Upscayl 실행 (에러 보고에 필요한 stderr 끝부분만 보관)
+    # stdout은 디버그 모드에서만 콘솔로 보여 주고 평소에는 읽지 않고 버림
+    returncode, stderr_tail = run_tail(upscale_cmd, stdout=None if DEBUG_MODE else subprocess.DEVNULL)
+    # 처리가 끝난 묶음 폴더(원본 BMP)는 바로 삭제하여 디스크에 쌓이지 않게 함
+    shutil.rmtree(chunk_dir, ignore_errors=True)
+    
+    # 결과 반환 (stderr 디코딩은 에러가 있거나 디버그 출력이 필요할 때만 handle_result에서)
+    return {'returncode': returncode, 'stderr': stderr_tail}
+
+def pipe_file(path, dst):
+    """파일 내용을 인코더 파이프로 보냅니다."""
+    with open(path, 'rb') as f:
+        # sendfile을 쓸 수 있으면(Linux) 커널이 페이지 캐시에서 파이프로 바로 복사하므로
+        # 프레임 데이터가 파이썬 버퍼를 거치지 않음 (지원하지 않으면 일반 복사)
+        if hasattr(os, 'sendfile'):
+            # 버퍼에 남은 이전 프레임 데이터가 있으면 먼저 내보내 순서가 섞이지 않도록 함
+            dst.flush()
+            size = os.fstat(f.fileno()).st_size
+            offset = 0
+            try:
+                while offset < size:
+                    sent = os.sendfile(dst.fileno(), f.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                return
+            except BrokenPipeError:
+                raise
+            except OSError:
+                # 파이프로 sendfile을 지원하지 않는 플랫폼 (예: macOS)
+                if offset:
+                    raise
+        shutil.copyfileobj(f, dst, 1 << 20)
+        dst.flush()
+
+def feed_encoder(encoder_stdin, result_queue, handle_result, abort_event, progress, chunk_slots, keep_frames=False):
+    """완료된 묶음의 업스케일 프레임을 원래 순서대로 인코더 stdin에 기록합니다."""
+    # 워커가 묶음을 끝내는 순서는 뒤섞이므로 묶음 번호를 키로 하는 힙에 보관했다가
+    # 다음 차례의 묶음이 도착하는 즉시 인코더로 보냄
+    pending = []
+    next_index = 0
+    while not abort_event.is_set():
+        # 큐 항목: (묶음 번호, 묶음 폴더, 프레임 파일 목록, future)
+        heapq.heappush(pending, result_queue.get())
+        while pending and pending[0][0] == next_index:
+            _, chunk_dir, chunk_frames, future = heapq.heappop(pending)
+            # future가 None인 항목은 전체 묶음 수를 알리는 종료 표시
+            if future is None:
+                return
+            
+            output_paths = handle_result(chunk_dir, chunk_frames, future)
+            if output_paths is None:
+                chunk_slots.release()
+                abort_event.set()
+                # 남은 묶음의 Upscayl이 끝날 때까지 기다리지 않도록 바로 종료
+                terminate_active_processes()
+                return
+            
+            try:
+                for output_path in output_paths:
+                    pipe_file(output_path, encoder_stdin)
+                    # 보낸 프레임은 바로 삭제 (쓰자마자 읽고 지우므로 대부분 페이지 캐시에서만 오감)
+                    # 이어하기 모드(keep_frames)에서는 작업이 성공할 때까지 남겨 둠
+                    if not keep_frames:
+                        os.remove(output_path)
+                    progress['encoded'] += 1
+            except OSError as e:
+                print(f"\n❌ 인코더에 프레임을 전달하지 못했습니다: {e}")
+                abort_event.set()
+                terminate_active_processes()
+                return
+            # 묶음을 인코더로 모두 보냈으므로 슬롯을 반환해 다음 묶음을 추출할 수 있게 함
+            chunk_slots.release()
+            next_index += 1
+
+def count_done_frames(output_dir, progress, keep_frames=False):
+    """업스케일이 끝난 프레임 수 (프레임을 남겨 두는 경우 출력 폴더에 모두 있음)"""
+    # 이름 목록을 만들지 않고 디렉토리 항목을 읽으면서 바로 셈
+    with os.scandir(output_dir) as entries:
+        in_folder = sum(1 for entry in entries if entry.name.endswith('.png'))
+    if keep_frames:
+        return in_folder
+    return progress['encoded'] + in_folder
+
+def watch_progress(pbar, output_dir, stop_event, progress, interval=0.2, keep_frames=False):
+    """인코딩된 프레임 수와 출력 폴더에 남아 있는 프레임 수로 진행 바를 갱신합니다."""
+    while not stop_event.wait(interval):
+        done = count_done_frames(output_dir, progress, keep_frames)
+        if done > pbar.n:
+            pbar.update(done - pbar.n)
+
+# PNG 파일의 마지막 12바이트 (IEND 청크)
+PNG_TRAILER = b'\x00\x00\x00\x00IEND\xaeB`\x82'
+
+def is_complete_png(entry):
+    """중단으로 쓰다 만 파일이 아닌지, PNG 끝(IEND 청크)까지 기록되었는지 확인합니다."""
+    size = entry.stat().st_size
+    if size < len(PNG_TRAILER):
+        return False
+    try:
+        with open(entry.path, 'rb') as f:
+            f.seek(size - len(PNG_TRAILER))
+            return f.read() == PNG_TRAILER
+    except OSError:
+        return False
+
+def load_done_frames(output_dir):
+    """출력 폴더에 이미 있는 (끝까지 기록된) 업스케일 프레임 이름을 모읍니다."""
+    if not os.path.isdir(output_dir):
+        return set()
+    with os.scandir(output_dir) as entries:
+        return {
+            entry.name for entry in entries
+            if entry.name.endswith('.png') and entry.is_file() and is_complete_png(entry)
+        }
 
 TEMP_DIR = "temp_frames"
 UPSCALED_DIR = "upscaled_frames"
+# 임시 폴더 후보 위치에 만든 작업 폴더 (현재 폴더를 사용하면 None)
+WORK_DIR = None
+# 임시 프레임을 RAM 기반(tmpfs) 폴더에 둘지 여부 (--no-ram-temp로 끔)
+USE_RAM_TEMP = True
+# 이전 실행에서 업스케일된 프레임을 이어서 사용할지 여부 (--resume)
+RESUME = False
+# Upscayl 한 번 실행에 넘길 최대 프레임 수와 묶음 하나의 목표 길이(초)
+UPSCALE_CHUNK_SIZE = 256
+UPSCALE_CHUNK_SECONDS = 5
+# 프레임 추출 시 파일 쓰기 스레드 수와 쓰기 대기 가능한 최대 프레임 수
+EXTRACT_WRITERS = 2
+EXTRACT_WRITE_AHEAD = 8
+
+def temp_root_candidates(persistent=False):
+    """임시 프레임 폴더를 둘 수 있는 후보 위치 (빠른 순, persistent면 RAM 폴더 제외)"""
+    # 이어하기용 폴더는 재부팅 후에도 남아야 하고 영상 전체 분량이 쌓이므로 /dev/shm을 쓰지 않음
+    roots = (None if persistent else '/dev/shm', os.environ.get('TMPDIR'), tempfile.gettempdir())
+    return [root for root in roots if root and os.path.isdir(root)]
+
+def resume_work_dir(root, video_path):
+    """이어하기용 작업 폴더 경로 (영상의 절대 경로마다 고정된 이름)"""
+    digest = hashlib.sha1(os.path.abspath(video_path).encode('utf-8', 'surrogateescape')).hexdigest()[:16]
+    return os.path.join(root, f"upscayv_resume_{digest}")
+
+def is_own_dir(path):
+    """심볼릭 링크가 아니고 현재 사용자가 소유한 폴더인지 확인합니다."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and (not hasattr(os, 'getuid') or st.st_uid == os.getuid())
+
+def find_resume_root(video_path):
+    """이전 실행의 업스케일 프레임이 남아 있는 작업 폴더를 찾습니다. 없으면 None을 반환합니다."""
+    for root in ['.', *temp_root_candidates(persistent=True)]:
+        work_dir = resume_work_dir(root, video_path)
+        if is_own_dir(work_dir):
+            return work_dir
+    return None
+
+def make_resume_dir(root, video_path):
+    """이어하기용 작업 폴더를 만듭니다 (다른 사용자가 미리 만든 폴더는 사용하지 않음)."""
+    work_dir = resume_work_dir(root, video_path)
+    try:
+        os.mkdir(work_dir, 0o700)
+    except FileExistsError:
+        if not is_own_dir(work_dir):
+            raise Exception(f"{work_dir} 폴더를 작업 폴더로 사용할 수 없습니다.")
+    return work_dir
+
+def pick_temp_root(required_bytes, persistent=False):
+    """임시 프레임을 둘 가장 빠른 폴더를 고릅니다.
+    
+    Linux의 /dev/shm(RAM)을 먼저 시도하고, 여유 공간이 부족하면 TMPDIR과
+    시스템 임시 폴더 순으로 확인합니다. 모두 부족하면 None(현재 폴더)을 반환합니다.
+    """
+    for root in temp_root_candidates(persistent):
+        try:
+            if shutil.disk_usage(root).free > required_bytes:
+                return root
+        except OSError:
+            continue
+    return None
 
 # 명령줄 인자 파싱
 def parse_arguments():
@@ -399,6 +877,9 @@ def parse_arguments():
   python upscayv.py              # 일반 모드로 실행
   python upscayv.py --debug       # 디버그 모드로 실행
   python upscayv.py -d            # 디버그 모드로 실행 (짧은 옵션)
+  python upscayv.py --no-cache    # 환경(FFmpeg/Upscayl/인코더)을 다시 감지
+  python upscayv.py --no-ram-temp # 임시 프레임을 현재 폴더에 저장
+  python upscayv.py --resume      # 중단된 작업을 이어서 진행
         """
     )
     parser.add_argument(
@@ -406,11 +887,28 @@ def parse_arguments():
         action='store_true',
         help='디버그 모드 활성화 (상세한 디버그 메시지 출력)'
     )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='저장된 환경 감지 결과를 무시하고 FFmpeg/Upscayl/인코더를 다시 감지'
+    )
+    parser.add_argument(
+        '--no-ram-temp',
+        action='store_true',
+        help='임시 프레임을 RAM 디스크(/dev/shm 등) 대신 현재 폴더에 저장'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='업스케일된 프레임을 작업이 성공할 때까지 보관하고, 이전 실행에서 남은 프레임은 건너뜀'
+    )
     return parser.parse_args()
 
 # 전역 변수 (워커 프로세스에서도 접근 가능하도록 모듈 레벨에 선언)
 VIDEO_ENCODER = None
 ffmpeg_path = None
+# NVENC 사용 시 스케일링까지 GPU(scale_cuda)에서 처리할 수 있는지 여부
+CUDA_SCALE = False
 
 RES_OPTIONS = {
     "1": ("HD", 1280, 720),
@@ -437,30 +935,42 @@ def get_resolution_name(width, height):
     # 매칭되지 않으면 해상도만 반환
     return None
 
+@lru_cache(maxsize=None)
 def get_video_info(video_path):
-    cmd = f'ffprobe -v error -select_streams v:0 -show_entries stream=width,height,r_frame_rate,nb_frames -of json "{video_path}"'
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-    data = json.loads(result.stdout)
-    
-    w = int(data['streams'][0]['width'])
-    h = int(data['streams'][0]['height'])
-    fps_raw = data['streams'][0]['r_frame_rate']
-    num, den = map(int, fps_raw.split('/'))
+    # 필요한 네 값만 한 줄(CSV)로 받아 JSON 파싱 없이 바로 나눔
+    cmd = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height,r_frame_rate,nb_frames',
+        '-of', 'csv=p=0', video_path
+    ]
+    out = subprocess.check_output(cmd).strip()
+    w, h, fps_raw, nb_frames = out.splitlines()[0].split(b',')[:4]
+    
+    num, den = map(int, fps_raw.split(b'/'))
     fps = num / den
-    # 총 프레임 수 (진행 바 표시용)
-    total_frames = int(data['streams'][0].get('nb_frames', 0))
+    # 총 프레임 수 (진행 바 표시용, 컨테이너에 없으면 'N/A'로 나옴)
+    total_frames = int(nb_frames) if nb_frames.isdigit() else 0
     
-    return w, h, fps, total_frames
+    return int(w), int(h), fps, total_frames
 
-def cleanup():
+def cleanup(keep_work_dir=False):
     """작업용 임시 폴더 삭제"""
     if os.path.exists(TEMP_DIR): shutil.rmtree(TEMP_DIR)
     if os.path.exists(UPSCALED_DIR): shutil.rmtree(UPSCALED_DIR)
+    if os.path.exists(UPSCALED_DIR + ".json"): os.remove(UPSCALED_DIR + ".json")
+    if WORK_DIR and not keep_work_dir and os.path.isdir(WORK_DIR): shutil.rmtree(WORK_DIR)
     print("🧹 임시 파일 정리가 완료되었습니다.")
 
 def run_upscale():
+    # 임시 폴더 위치는 작업 크기에 따라 정해짐
+    global TEMP_DIR, UPSCALED_DIR, WORK_DIR
+    
     # 1. 파일 선택
-    video_files = [f for f in os.listdir('.') if f.endswith('.mp4') and not f.startswith('output_')]
+    with os.scandir('.') as entries:
+        video_files = sorted(
+            entry.name for entry in entries
+            if entry.name.endswith('.mp4') and not entry.name.startswith('output_') and entry.is_file()
+        )
     if not video_files:
         print("❌ MP4 파일을 찾을 수 없습니다."); return
     
@@ -517,25 +1027,15 @@ def run_upscale():
     
     scale_factor = 4 if final_width / width > 2 else 2
 
-    # 3. 폴더 초기화
-    cleanup()
-    os.makedirs(TEMP_DIR, exist_ok=True)
-    os.makedirs(UPSCALED_DIR, exist_ok=True)
-
+    succeeded = False
     try:
-        # 4. 프레임 추출
-        print(f"\n[1/3] 🎞️ 프레임 추출 중...")
-        subprocess.run(f'ffmpeg -i "{selected_video}" -q:v 2 "{TEMP_DIR}/frame_%05d.png"', shell=True, check=True)
-
-        # 5. AI 업스케일링 (폴더 전체를 배치로 처리)
-        print(f"\n[2/3] 🤖 AI 업스케일링 시작 ({res_name})...")
-        
-        # 업스케일링 작업 시작 시간 기록
-        upscale_start_time = time.time()
-        
+        # 4. 모델 선택
         # 모델 폴더에서 사용 가능한 모델 찾기
         model_path_abs = os.path.abspath(MODEL_PATH) if os.path.exists(MODEL_PATH) else MODEL_PATH
-        available_models = find_available_models(model_path_abs)
+        if AVAILABLE_MODELS is not None:
+            available_models = AVAILABLE_MODELS
+        else:
+            available_models = find_available_models(model_path_abs)
         
         if not available_models:
             raise Exception(f"모델 폴더에서 사용 가능한 모델을 찾을 수 없습니다: {model_path_abs}")
@@ -573,29 +1073,26 @@ def run_upscale():
             
             print(f"✅ 선택된 모델: {selected_model}")
         
-        # temp_frames 폴더의 모든 PNG 파일 확인
-        frame_files = sorted([f for f in os.listdir(TEMP_DIR) if f.endswith('.png')])
-        if not frame_files:
-            raise Exception(f"{TEMP_DIR} 폴더에 프레임 파일이 없습니다.")
-        
-        # 절대 경로로 변환
-        input_dir_abs = os.path.abspath(TEMP_DIR)
-        output_dir_abs = os.path.abspath(UPSCALED_DIR)
-        
         # CPU/GPU 정보 확인 및 최적 워커 수 계산
         cpu_count = get_cpu_info()
-        gpu_count = get_gpu_info()
+        if GPU_INFO is not None:
+            gpu_count, vram_mb = GPU_INFO
+        else:
+            gpu_count = get_gpu_info()
+            vram_mb = get_gpu_vram() if gpu_count > 0 else ()
         has_gpu_encoder = VIDEO_ENCODER in ['h264_nvenc', 'h264_amf']
         
         print(f"\n[시스템 정보]")
         print(f"  CPU 코어 수: {cpu_count}")
         if gpu_count > 0:
             print(f"  GPU 개수: {gpu_count}")
+            if vram_mb:
+                print(f"  GPU 메모리: {', '.join(f'{mb // 1024}GB' for mb in vram_mb)}")
         else:
             print(f"  GPU: 감지되지 않음")
         
         # 최적 워커 수 계산
-        recommended_workers = calculate_optimal_workers(cpu_count, gpu_count, has_gpu_encoder)
+        recommended_workers = calculate_optimal_workers(cpu_count, gpu_count, has_gpu_encoder, vram_mb)
         
         # 사용자에게 워커 수 확인
         print(f"\n[병렬 처리 설정]")
@@ -607,11 +1104,6 @@ def run_upscale():
                 if num_workers < 1:
                     print("  ⚠️ 워커 수는 1 이상이어야 합니다. 기본값을 사용합니다.")
                     num_workers = recommended_workers
-                elif num_workers > cpu_count * 2:
-                    print(f"  ⚠️ 워커 수가 너무 많습니다. CPU 코어 수({cpu_count})의 2배를 초과합니다.")
-                    confirm = input(f"  계속하시겠습니까? (y/n, 기본값: n): ").strip().lower()
-                    if confirm != 'y':
-                        num_workers = recommended_workers
             else:
                 num_workers = recommended_workers
         except (ValueError, KeyboardInterrupt):
@@ -620,126 +1112,290 @@ def run_upscale():
         
         print(f"  ✅ {num_workers}개의 워커로 병렬 처리합니다.")
         
-        # Upscayl 명령어: 폴더 전체를 배치로 처리
-        # 각 파일에 대해 절대 경로 + 파일명으로 출력 지정
+        # 프레임을 묶음 폴더로 나누어 Upscayl 한 번 실행에 여러 프레임을 처리
+        # 묶음은 약 5초 분량으로 하여 첫 묶음이 빨리 인코더에 도착하고 디스크에 머무는 프레임이 적도록 함
+        chunk_size = max(1, min(UPSCALE_CHUNK_SIZE, round(fps * UPSCALE_CHUNK_SECONDS)))
+        # 워커 수보다 묶음이 적어 놀고 있는 워커가 생기지 않도록 묶음 크기 조정
+        if total_frames > 0:
+            chunk_size = max(1, min(chunk_size, -(-total_frames // num_workers)))
+        
+        # 3. 폴더 초기화
+        # 이어하기면 이전 실행의 업스케일 프레임이 있는 작업 폴더를 그대로 사용
+        work_dir = find_resume_root(selected_video) if RESUME else None
+        if work_dir is None:
+            temp_root = None
+            if USE_RAM_TEMP:
+                # 동시에 디스크에 머무는 프레임은 처리 중인 묶음(워커 수 x 2)과 추출 중인 묶음뿐
+                # (BMP 원본 3바이트/픽셀 + 업스케일 PNG 최대 4바이트/픽셀)
+                # 이어하기 모드는 성공할 때까지 업스케일 프레임을 모두 보관
+                frame_bytes = width * height * 3 + width * height * scale_factor ** 2 * 4
+                kept_frames = total_frames if RESUME else (num_workers * 2 + 1) * chunk_size
+                if kept_frames:
+                    temp_root = pick_temp_root(kept_frames * frame_bytes, persistent=RESUME)
+            if RESUME:
+                # 다음 실행에서 찾을 수 있도록 영상마다 고정된 이름을 사용
+                work_dir = make_resume_dir(temp_root or '.', selected_video)
+            elif temp_root:
+                # 실행마다 새 폴더를 만들어 동시에 실행된 다른 작업과 섞이지 않도록 함
+                work_dir = tempfile.mkdtemp(prefix='upscayv_', dir=temp_root)
+        if work_dir:
+            WORK_DIR = work_dir
+            TEMP_DIR = os.path.join(work_dir, "temp_frames")
+            UPSCALED_DIR = os.path.join(work_dir, "upscaled_frames")
+            print(f"  💾 임시 프레임 폴더: {work_dir}")
+        
+        done_frames = set()
+        if RESUME:
+            # 같은 영상(경로/크기/수정 시각)과 모델/배율로 만든 프레임만 이어서 사용
+            video_stat = os.stat(selected_video)
+            job = {
+                'video': os.path.abspath(selected_video), 'size': video_stat.st_size,
+                'mtime': video_stat.st_mtime_ns, 'model': selected_model, 'scale': scale_factor
+            }
+            job_path = UPSCALED_DIR + ".json"
+            try:
+                with open(job_path, 'r', encoding='utf-8') as f:
+                    previous_job = json.load(f)
+            except (OSError, ValueError):
+                previous_job = None
+            if previous_job == job:
+                if os.path.exists(TEMP_DIR): shutil.rmtree(TEMP_DIR)
+                done_frames = load_done_frames(UPSCALED_DIR)
+                if done_frames:
+                    print(f"  ♻️ 이전 작업에서 업스케일된 {len(done_frames)}개 프레임을 이어서 사용합니다.")
+            else:
+                cleanup(keep_work_dir=True)
+            os.makedirs(UPSCALED_DIR, exist_ok=True)
+            with open(job_path, 'w', encoding='utf-8') as f:
+                json.dump(job, f, ensure_ascii=False)
+        elif WORK_DIR is None:
+            cleanup()
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        os.makedirs(UPSCALED_DIR, exist_ok=True)
+        
+        # GPU 인코더가 있으면 프레임 추출 시 디코딩도 GPU에서 처리 (실패 시 CPU 디코딩)
+        hwaccel_args = detect_decode_hwaccel(selected_video, VIDEO_ENCODER)
+        if hwaccel_args:
+            print(f"  🚀 하드웨어 디코딩: {hwaccel_args[1]}")
+        
+        # 절대 경로로 변환
+        input_dir_abs = os.path.abspath(TEMP_DIR)
+        output_dir_abs = os.path.abspath(UPSCALED_DIR)
+        
+        output_name = f"output_{res_name}_{selected_video}"
+        
+        # 인코더는 업스케일된 PNG를 stdin(image2pipe)으로 받아 바로 인코딩
+        merge_cmd = [
+            'ffmpeg', '-y', '-hide_banner', *ffmpeg_log_args(),
+            '-f', 'image2pipe', '-framerate', str(fps), '-c:v', 'png', '-i', '-',
+            '-i', selected_video,
+            *build_scale_args(VIDEO_ENCODER, final_width, final_height, cuda_scale=CUDA_SCALE),
+            '-c:v', VIDEO_ENCODER, *ENCODER_PARAMS.get(VIDEO_ENCODER, []),
+            '-c:a', 'copy', '-map', '0:v:0', '-map', '1:a:0?',
+            output_name
+        ]
+        
+        # 5. 프레임 추출 → AI 업스케일링 → 인코딩을 동시에 진행
+        # 추출된 묶음은 바로 업스케일링 워커에 전달되고, 완료된 묶음은 순서대로 인코더에 기록됨
+        print(f"\n[1/3] 🎞️ 프레임 추출 → [2/3] 🤖 AI 업스케일링 ({res_name}) → [3/3] 🎬 인코딩 (Encoder: {VIDEO_ENCODER})")
+        print("  세 단계를 동시에 진행합니다...")
+        
         debug_print(f"\n[디버그] 입력 폴더: {input_dir_abs}")
         debug_print(f"[디버그] 출력 폴더: {output_dir_abs}")
         debug_print(f"[디버그] 모델: {selected_model}")
         debug_print(f"[디버그] 스케일: {scale_factor}x")
+        debug_print(f"[디버그] 묶음당 최대 프레임 수: {chunk_size}")
+        if gpu_count > 1:
+            debug_print(f"[디버그] 워커를 GPU 0~{gpu_count - 1}에 나누어 배정합니다.")
         
-        # 첫 번째 프레임에 대한 명령어 예시 출력
-        if frame_files:
-            first_frame = frame_files[0]
-            first_input = os.path.join(input_dir_abs, first_frame)
-            first_output = os.path.join(output_dir_abs, first_frame)
-            upscale_cmd_example = f'"{UPSCAYL_PATH}" -i "{first_input}" -o "{first_output}" -s {scale_factor} -m "{model_path_abs}" -n {selected_model}'
-            debug_print(f"\n[디버그] Upscayl 명령어 예시: {upscale_cmd_example}")
-        
-        # 병렬 처리 준비: 각 프레임에 대한 작업 인자 생성
-        work_args = [
-            (
-                frame_file,
-                input_dir_abs,
-                output_dir_abs,
-                UPSCAYL_PATH,
-                model_path_abs,
-                selected_model,
-                scale_factor,
-                ffmpeg_path
-            )
-            for frame_file in frame_files
-        ]
+        # Upscayl 인자 리스트는 실행마다 한 번만 구성
+        upscale_base_cmd = build_upscale_cmd(UPSCAYL_PATH, model_path_abs, selected_model, scale_factor)
+        # GPU가 여러 개면 GPU별 명령어(Upscayl -g 옵션)도 미리 만들어 둠
+        # 주의: GPU 개수는 nvidia-smi 기준이지만 -g는 Vulkan 장치 번호이므로
+        # 내장 GPU 등 다른 Vulkan 장치가 있으면 번호가 어긋날 수 있음
+        if gpu_count > 1:
+            gpu_cmds = [upscale_base_cmd + ['-g', str(gpu_index)] for gpu_index in range(gpu_count)]
+        else:
+            gpu_cmds = [upscale_base_cmd]
+        
+        # 비어 있는 GPU 번호 (워커 수만큼 GPU에 고르게 나누어 넣어 GPU별 동시 실행 수를 고정)
+        free_gpus = queue.Queue()
+        for worker_index in range(num_workers):
+            free_gpus.put(worker_index % len(gpu_cmds))
+        
+        def upscale_one(chunk_dir):
+            """이번 실행의 출력 폴더를 고정하고 비어 있는 GPU에서 실행하는 묶음 업스케일 작업"""
+            gpu_index = free_gpus.get()
+            try:
+                return upscale_chunk(chunk_dir, output_dir_abs, gpu_cmds[gpu_index])
+            finally:
+                free_gpus.put(gpu_index)
+        
+        # 첫 번째 묶음에 대한 명령어 예시 출력
+        first_chunk_dir = os.path.join(input_dir_abs, "chunk_00000")
+        upscale_cmd_example = subprocess.list2cmdline(upscale_base_cmd + ['-i', first_chunk_dir, '-o', output_dir_abs])
+        debug_print(f"\n[디버그] Upscayl 명령어 예시: {upscale_cmd_example}")
+        debug_print(f"[디버그] 인코더 명령어: {subprocess.list2cmdline(merge_cmd)}")
         
-        # 병렬 처리 실행
-        # 작업 큐를 사용하여 워커가 작업을 완료하면 즉시 다음 작업을 가져오도록 최적화
         failed_frames = []
-        completed_count = 0
-        
-        with tqdm(total=len(frame_files), desc="Upscaling", unit="frame") as pbar:
-            with ProcessPoolExecutor(max_workers=num_workers) as executor:
-                # 작업 큐: 워커 수의 2-3배만큼 미리 제출하여 GPU를 지속적으로 활용
-                # 나머지는 워커가 작업을 완료할 때마다 동적으로 제출
-                work_queue = iter(work_args)
-                future_to_frame = {}
-                
-                # 초기 작업 제출: 워커 수의 2배만큼 미리 제출
-                initial_batch_size = min(num_workers * 2, len(work_args))
-                for i, args in enumerate(work_args):
-                    if i >= initial_batch_size:
-                        break
-                    future = executor.submit(upscale_single_frame, args)
-                    future_to_frame[future] = args[0]
-                
-                # 완료된 작업 처리 및 새 작업 제출
-                pending_count = initial_batch_size
+        completed_chunks = []
+        
+        def handle_result(chunk_dir, chunk_frames, future):
+            """묶음 업스케일링 결과를 확인하고, 성공하면 인코더에 보낼 파일 경로 목록을 반환합니다."""
+            chunk_name = os.path.basename(chunk_dir)
+            try:
+                result = future.result()
+            except Exception as e:
+                for frame_file in chunk_frames:
+                    failed_frames.append({
+                        'frame': frame_file,
+                        'returncode': -1,
+                        'stderr': str(e)
+                    })
+                print(f"\n❌ 묶음 {chunk_name} 처리 중 예외 발생: {e}")
+                return None
+            
+            # stderr는 첫 묶음 디버그 출력이나 에러 보고에 필요할 때만 문자열로 변환
+            stderr_text = ''
+            if result['returncode'] != 0 or not completed_chunks:
+                stderr_text = result['stderr'].decode('utf-8', errors='ignore')
+            
+            # 첫 번째 완료된 묶음에 대한 디버그 정보 출력
+            if not completed_chunks:
+                debug_print(f"\n[디버그] 첫 번째 묶음 처리 완료: {chunk_name}")
+                debug_print(f"[디버그] 종료 코드: {result['returncode']}")
+                if stderr_text:
+                    debug_print(f"[디버그] stderr:\n{stderr_text[:500]}")
+            completed_chunks.append(chunk_name)
+            
+            # 에러 확인
+            if result['returncode'] != 0:
+                print(f"\n❌ 묶음 {chunk_name} 업스케일링 실패 (종료 코드: {result['returncode']})")
+                if stderr_text:
+                    print(f"에러: {stderr_text[-300:]}")
+            
+            # 출력 파일 확인 (Upscayl이 일부 프레임만 처리하고 끝난 경우도 확인)
+            output_paths = []
+            missing_count = 0
+            for frame_file in chunk_frames:
+                output_path = os.path.join(output_dir_abs, upscaled_frame_name(frame_file))
+                if not os.path.exists(output_path):
+                    if not stderr_text:
+                        stderr_text = result['stderr'].decode('utf-8', errors='ignore')
+                    failed_frames.append({
+                        'frame': frame_file,
+                        'returncode': result['returncode'] or -1,
+                        'stderr': stderr_text[-300:] or f"업스케일된 파일이 생성되지 않았습니다: {output_path}"
+                    })
+                    missing_count += 1
+                output_paths.append(output_path)
+            
+            if result['returncode'] != 0 and missing_count == 0:
+                failed_frames.append({
+                    'frame': chunk_name,
+                    'returncode': result['returncode'],
+                    'stderr': stderr_text[-300:]
+                })
+            if result['returncode'] != 0 or missing_count > 0:
+                return None
+            return output_paths
+        
+        # 업스케일링 작업 시작 시간 기록
+        upscale_start_time = time.time()
+        
+        encoder = subprocess.Popen(merge_cmd, stdin=subprocess.PIPE)
+        result_queue = queue.Queue()
+        abort_event = threading.Event()
+        # 인코더로 전달(후 삭제)된 프레임 수
+        progress = {'encoded': 0}
+        # 추출이 업스케일링/인코딩보다 너무 앞서 나가 디스크를 채우지 않도록 동시에 존재하는 묶음 수 제한
+        # (슬롯은 인코더가 묶음의 프레임을 모두 받아 간 뒤에 반환됨)
+        in_flight = threading.BoundedSemaphore(num_workers * 2)
+        feeder = threading.Thread(
+            target=feed_encoder,
+            args=(encoder.stdin, result_queue, handle_result, abort_event, progress, in_flight, RESUME),
+            daemon=True
+        )
+        feeder.start()
+        
+        chunk_count = 0
+        frame_count = 0
+        try:
+            with tqdm(total=total_frames or None, desc="Upscaling", unit="frame") as pbar:
+                # Upscayl이 폴더 단위로 처리하므로 출력 폴더를 주기적으로 확인하여 진행률 표시
+                stop_event = threading.Event()
+                progress_thread = threading.Thread(
+                    target=watch_progress,
+                    args=(pbar, output_dir_abs, stop_event, progress),
+                    kwargs={'keep_frames': RESUME},
+                    daemon=True
+                )
+                progress_thread.start()
                 
-                while future_to_frame:
-                    # 완료된 작업 처리
-                    for future in as_completed(future_to_frame):
-                        frame_file = future_to_frame.pop(future)
-                        try:
-                            result = future.result()
-                            
-                            # 첫 번째 완료된 프레임에 대한 디버그 정보 출력
-                            if completed_count == 0:
-                                debug_print(f"\n[디버그] 첫 번째 프레임 처리 완료: {result['frame_file']}")
-                                debug_print(f"[디버그] 종료 코드: {result['returncode']}")
-                                if result['stderr']:
-                                    debug_print(f"[디버그] stderr:\n{result['stderr'][:500]}")
-                            
-                            # 에러 확인
-                            if result['returncode'] != 0:
-                                failed_frames.append({
-                                    'frame': result['frame_file'],
-                                    'returncode': result['returncode'],
-                                    'stderr': result['stderr']
-                                })
-                                print(f"\n❌ 프레임 {result['frame_file']} 업스케일링 실패 (종료 코드: {result['returncode']})")
-                                if result['stderr']:
-                                    print(f"에러: {result['stderr'][-300:]}")
-                            
-                            # 출력 파일 확인
-                            if not os.path.exists(result['output_path']):
-                                failed_frames.append({
-                                    'frame': result['frame_file'],
-                                    'returncode': -1,
-                                    'stderr': f"업스케일된 파일이 생성되지 않았습니다: {result['output_path']}"
-                                })
-                                print(f"\n❌ 업스케일된 파일이 생성되지 않았습니다: {result['output_path']}")
-                            
-                            completed_count += 1
-                            pbar.update(1)
+                try:
+                    # 각 워커는 Upscayl 프로세스 종료를 기다리기만 하므로 프로세스 풀 대신 스레드로 충분
+                    executor = ThreadPoolExecutor(max_workers=num_workers)
+                    try:
+                        for chunk_dir, chunk_frames in extract_frames(selected_video, input_dir_abs, chunk_size, done_frames, hwaccel_args):
+                            # 인코더가 멈춰 슬롯이 반환되지 않아도 중단 요청은 확인
+                            while not in_flight.acquire(timeout=0.2):
+                                if abort_event.is_set():
+                                    break
+                            if abort_event.is_set():
+                                break
                             
-                            # 워커가 작업을 완료하면 즉시 다음 작업 제출 (GPU 유휴 시간 최소화)
-                            try:
-                                next_args = next(work_queue)
-                                next_future = executor.submit(upscale_single_frame, next_args)
-                                future_to_frame[next_future] = next_args[0]
-                                pending_count += 1
-                            except StopIteration:
-                                # 더 이상 제출할 작업이 없음
-                                pass
+                            future = executor.submit(upscale_one, chunk_dir)
                             
-                        except Exception as e:
-                            failed_frames.append({
-                                'frame': frame_file,
-                                'returncode': -1,
-                                'stderr': str(e)
-                            })
-                            print(f"\n❌ 프레임 {frame_file} 처리 중 예외 발생: {e}")
-                            pbar.update(1)
+                            def on_done(future, index=chunk_count, chunk_dir=chunk_dir, chunk_frames=chunk_frames):
+                                result_queue.put((index, chunk_dir, chunk_frames, future))
                             
-                            # 예외가 발생해도 다음 작업 제출 시도
-                            try:
-                                next_args = next(work_queue)
-                                next_future = executor.submit(upscale_single_frame, next_args)
-                                future_to_frame[next_future] = next_args[0]
-                                pending_count += 1
-                            except StopIteration:
-                                pass
-                        
-                        # 한 번에 하나씩 처리하므로 break
-                        break
+                            future.add_done_callback(on_done)
+                            chunk_count += 1
+                            frame_count += len(chunk_frames)
+                        # 추출이 끝난 뒤 남은 묶음의 업스케일링을 기다리는 동안의 Ctrl+C도 아래에서 처리
+                        executor.shutdown(wait=True)
+                    except BaseException:
+                        abort_event.set()
+                        raise
+                    finally:
+                        # 중단(Ctrl+C)이나 실패 시 대기 중인 묶음은 취소하고 실행 중인 Upscayl은 종료해야
+                        # 스레드 풀이 남은 작업을 기다리지 않고 바로 닫힘
+                        if abort_event.is_set():
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            terminate_active_processes()
+                        executor.shutdown(wait=True)
+                except BaseException:
+                    # 추출 실패나 중단 시 피더가 남은 묶음을 인코더에 보내지 않도록 먼저 중단 표시
+                    abort_event.set()
+                    raise
+                finally:
+                    # 묶음 수를 알리는 종료 표시 (피더는 이 번호 앞의 묶음을 모두 기록하면 종료)
+                    result_queue.put((chunk_count, None, None, None))
+                    feeder.join()
+                    stop_event.set()
+                    progress_thread.join()
+                
+                # 마지막 진행률 반영 (피더가 끝났으므로 인코딩된 프레임 수가 곧 완료 수)
+                if progress['encoded'] > pbar.n:
+                    pbar.update(progress['encoded'] - pbar.n)
+        except BaseException:
+            abort_event.set()
+            raise
+        finally:
+            if abort_event.is_set():
+                encoder.kill()
+            else:
+                try:
+                    encoder.stdin.close()
+                except BrokenPipeError:
+                    pass
+            encoder.wait()
+            # 중단되었거나 인코더가 실패했으면 만들다 만 결과 파일 삭제
+            if (abort_event.is_set() or encoder.returncode != 0) and os.path.exists(output_name):
+                os.remove(output_name)
+        
+        if frame_count == 0:
+            raise Exception(f"{TEMP_DIR} 폴더에 프레임 파일이 없습니다.")
         
         # 실패한 프레임이 있으면 에러 발생
         if failed_frames:
@@ -750,11 +1406,16 @@ def run_upscale():
                 error_msg += f"  ... 외 {len(failed_frames) - 5}개\n"
             raise Exception(error_msg)
         
-        final_count = len([f for f in os.listdir(UPSCALED_DIR) if f.endswith('.png')])
-        if final_count < len(frame_files):
-            print(f"\n⚠️ 경고: 예상 {len(frame_files)}개 프레임 중 {final_count}개만 생성되었습니다.")
+        if abort_event.is_set():
+            raise Exception("인코더에 프레임을 전달하지 못했습니다.")
+        if encoder.returncode != 0:
+            raise subprocess.CalledProcessError(encoder.returncode, merge_cmd)
+        
+        final_count = progress['encoded']
+        if final_count < frame_count:
+            print(f"\n⚠️ 경고: 예상 {frame_count}개 프레임 중 {final_count}개만 생성되었습니다.")
 
-        # 업스케일링 작업 완료 시간 계산 및 표시
+        # 작업 완료 시간 계산 및 표시
         upscale_end_time = time.time()
         upscale_elapsed = upscale_end_time - upscale_start_time
         hours = int(upscale_elapsed // 3600)
@@ -769,76 +1430,119 @@ def run_upscale():
             time_str = f"{seconds}초"
         
         print(f"\n⏱️ 업스케일링 작업 완료: {time_str} ({upscale_elapsed:.2f}초)")
-        if len(frame_files) > 0:
-            avg_time_per_frame = upscale_elapsed / len(frame_files)
+        if frame_count > 0:
+            avg_time_per_frame = upscale_elapsed / frame_count
             print(f"   평균 프레임당 처리 시간: {avg_time_per_frame:.2f}초")
 
-        # 6. 최종 합성 (GPU 가속 사용)
-        print(f"\n[3/3] 🎬 영상 합성 및 인코딩 중 (Encoder: {VIDEO_ENCODER})...")
-        output_name = f"output_{res_name}_{selected_video}"
-        
-        # 인코더별 추가 파라미터 설정
-        encoder_params = ""
-        if VIDEO_ENCODER == "h264_amf":
-            # AMD AMF 인코더에 적절한 파라미터 추가
-            encoder_params = "-quality speed -rc cqp -qp_i 23 -qp_p 23"
-        elif VIDEO_ENCODER == "h264_nvenc":
-            # NVIDIA NVENC 인코더에 적절한 파라미터 추가 (선택사항)
-            encoder_params = "-preset fast"
-        
-        merge_cmd = (
-            f'ffmpeg -y -framerate {fps} -i "{UPSCALED_DIR}/frame_%05d.png" -i "{selected_video}" '
-            f'-vf "scale={final_width}:{final_height}:flags=lanczos" '
-            f'-c:v {VIDEO_ENCODER} {encoder_params} -pix_fmt yuv420p -c:a copy -map 0:v:0 -map 1:a:0? "{output_name}"'
-        )
-        subprocess.run(merge_cmd, shell=True, check=True)
-
         print(f"\n✅ 성공! 결과물: {output_name}")
+        succeeded = True
 
+    except KeyboardInterrupt:
+        print("\n\n작업이 취소되었습니다.")
     except Exception as e:
         print(f"\n❌ 오류 발생: {e}")
     finally:
-        # 7. 마무리 정리 (자동으로 임시 파일 삭제)
-        cleanup()
+        # 6. 마무리 정리 (자동으로 임시 파일 삭제)
+        if RESUME and not succeeded:
+            # 이어하기 모드에서는 업스케일된 프레임을 남겨 다음 실행에서 재사용
+            if os.path.exists(TEMP_DIR): shutil.rmtree(TEMP_DIR)
+            if os.path.isdir(UPSCALED_DIR):
+                print("♻️ 업스케일된 프레임을 보관했습니다. --resume으로 다시 실행하면 이어서 작업합니다.")
+        else:
+            cleanup()
 
 if __name__ == "__main__":
-    # Windows에서 multiprocessing을 사용할 때 필요
-    multiprocessing.freeze_support()
-    
     # 명령줄 인자 파싱 및 디버그 모드 설정
     args = parse_arguments()
     DEBUG_MODE = args.debug
+    USE_RAM_TEMP = not args.no_ram_temp
+    RESUME = args.resume
     
     if DEBUG_MODE:
         print("🐛 디버그 모드가 활성화되었습니다.\n")
     
-    # FFmpeg 확인
-    ffmpeg_available, ffmpeg_path = check_ffmpeg()
-    if not ffmpeg_available:
-        print("⚠️ FFmpeg을 찾을 수 없습니다.")
-        print("   FFmpeg이 설치되어 있고 PATH 환경 변수에 등록되어 있는지 확인하세요.")
-        print("   확인 방법: 터미널에서 'ffmpeg -version' 입력")
-        exit(1)
-    else:
+    # 이전 실행의 환경 감지 결과가 유효하면 FFmpeg/Upscayl/인코더 감지를 건너뜀
+    env_cache = None if args.no_cache else load_env_cache(shutil.which('ffmpeg'))
+    if env_cache:
+        ffmpeg_path = env_cache['ffmpeg_path']
+        UPSCAYL_PATH = env_cache['upscayl_path']
+        MODEL_PATH = env_cache['model_path']
+        AVAILABLE_MODELS = env_cache['models']
+        VIDEO_ENCODER = env_cache['video_encoder']
+        CUDA_SCALE = env_cache.get('cuda_scale', False)
+        if 'gpu_count' in env_cache and env_cache.get('nvidia_smi') == nvidia_smi_key():
+            GPU_INFO = (env_cache['gpu_count'], tuple(env_cache['vram_mb']))
+        
+        print("⚡ 저장된 환경 감지 결과를 사용합니다. (다시 감지하려면 --no-cache)")
         print(f"1. 🎬 FFmpeg: {ffmpeg_path}")
-    
-    # Upscayl 경로 표시
-    print(f"2. 🖼️ Upscayl: {UPSCAYL_PATH}")
-    if MODEL_PATH and os.path.exists(MODEL_PATH):
+        print(f"2. 🖼️ Upscayl: {UPSCAYL_PATH}")
         print(f"3. 📦 모델 경로: {MODEL_PATH}")
-    
-    # 비디오 인코더 감지 (메인 프로세스에서만 실행)
-    VIDEO_ENCODER = detect_video_encoder()
+    else:
+        # FFmpeg 확인
+        ffmpeg_available, ffmpeg_path = check_ffmpeg()
+        if not ffmpeg_available:
+            print("⚠️ FFmpeg을 찾을 수 없습니다.")
+            print("   FFmpeg이 설치되어 있고 PATH 환경 변수에 등록되어 있는지 확인하세요.")
+            print("   확인 방법: 터미널에서 'ffmpeg -version' 입력")
+            exit(1)
+        else:
+            print(f"1. 🎬 FFmpeg: {ffmpeg_path}")
+        
+        # Upscayl 경로 확인
+        UPSCAYL_PATH = find_upscayl_path()
+        if UPSCAYL_PATH is None:
+            print("⚠️ Upscayl 실행 파일을 찾을 수 없습니다.")
+            print("다음 경로 중 하나에 설치되어 있는지 확인해주세요:")
+            print("  - %LOCALAPPDATA%\\Programs\\upscayl\\upscayl-bin.exe")
+            print("  - %PROGRAMFILES%\\upscayl\\upscayl-bin.exe")
+            print("  - 또는 PATH 환경 변수에 등록되어 있는지 확인하세요.")
+            exit(1)
+        print(f"2. 🖼️ Upscayl: {UPSCAYL_PATH}")
+        
+        # Upscayl 실행 파일이 있는 디렉토리에서 models 폴더 찾기
+        MODEL_PATH = find_model_path(UPSCAYL_PATH)
+        if MODEL_PATH is None:
+            # 기본값으로 상대 경로 사용 (사용자가 직접 설정 가능)
+            MODEL_PATH = "models"
+            print(f"⚠️ 모델 폴더를 자동으로 찾지 못했습니다. 기본값 '{MODEL_PATH}'을 사용합니다.")
+            print(f"   필요시 스크립트에서 MODEL_PATH를 직접 설정해주세요.")
+        if os.path.exists(MODEL_PATH):
+            print(f"3. 📦 모델 경로: {MODEL_PATH}")
+        
+        # 비디오 인코더 감지 (메인 프로세스에서만 실행)
+        VIDEO_ENCODER, encoder_fallback = detect_video_encoder()
+        
+        # NVENC를 사용하면 최종 스케일링도 GPU에서 할 수 있는지 확인 (실패 시 CPU 스케일링)
+        if VIDEO_ENCODER == "h264_nvenc":
+            CUDA_SCALE = test_cuda_scaling(debug=DEBUG_MODE)
+            if CUDA_SCALE:
+                print("  [성공] GPU 스케일링(scale_cuda)을 사용할 수 있습니다!")
+            else:
+                print("  [정보] GPU 스케일링(scale_cuda)을 사용할 수 없어 CPU 스케일링을 사용합니다.")
+        
+        # 모델 폴더를 찾은 경우에만 다음 실행을 위해 감지 결과 저장
+        if os.path.isdir(MODEL_PATH):
+            AVAILABLE_MODELS = find_available_models(os.path.abspath(MODEL_PATH))
+            gpu_count = get_gpu_info()
+            GPU_INFO = (gpu_count, get_gpu_vram() if gpu_count > 0 else ())
+            # GPU 인코더 테스트 실패로 CPU 인코더를 쓰게 됐으면 곧 다시 감지하도록 짧게 저장
+            cache_ttl = ENV_CACHE_FALLBACK_TTL if encoder_fallback else ENV_CACHE_TTL
+            save_env_cache(ffmpeg_path, UPSCAYL_PATH, MODEL_PATH, AVAILABLE_MODELS, VIDEO_ENCODER, CUDA_SCALE, GPU_INFO, cache_ttl)
     
     encoder_info = {
         'h264_nvenc': '(NVIDIA GPU 가속)',
         'h264_amf': '(AMD GPU 가속)',
         'libx264': '(CPU 인코딩)'
     }
-    print(f"4. 📹 비디오 인코더: {VIDEO_ENCODER} {encoder_info.get(VIDEO_ENCODER, '(알 수 없음)')}") 
+    scale_info = " + GPU 스케일링" if CUDA_SCALE else ""
+    print(f"4. 📹 비디오 인코더: {VIDEO_ENCODER} {encoder_info.get(VIDEO_ENCODER, '(알 수 없음)')}{scale_info}")
     
     # 전역 변수 업데이트 (워커 프로세스에서도 접근 가능하도록)
     globals()['VIDEO_ENCODER'] = VIDEO_ENCODER
     globals()['ffmpeg_path'] = ffmpeg_path
+    globals()['CUDA_SCALE'] = CUDA_SCALE
+    
+    # 자식 프로세스(Upscayl/FFmpeg)가 환경 변수를 그대로 상속하도록 PATH는 시작 시 한 번만 수정
+    add_ffmpeg_to_path(ffmpeg_path)
     
     run_upscale()
\ No newline at end of file